@@ -9,9 +9,23 @@ from flasgger import Swagger
 import json 
 import os
 import uuid
+import gzip
+import hashlib
+import zlib
 from datetime import datetime
 from typing import List, Dict
 
+# Codificaciones opcionales: se usan solo si el paquete está instalado
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 # === FLASK APP ===
 app = Flask(__name__)
 app.config.from_object(Config)
@@ -77,6 +91,242 @@ class MediaFile(db.Model):
             "uploaded_at": self.uploaded_at.isoformat() if self.uploaded_at else None
         }
 
+# === CHANGE FEED ===
+MEDIA_CHANGE_UPSERT = "upsert"
+MEDIA_CHANGE_DELETE = "delete"
+CHANGES_DEFAULT_LIMIT = Config.CHANGES_DEFAULT_LIMIT
+CHANGES_MAX_LIMIT = Config.CHANGES_MAX_LIMIT
+CHANGES_MAX_TOKEN = 2**63 - 1  # seq es BIGINT
+# Clave del advisory lock del change feed: crc32 del nombre de la tabla, así es estable
+# entre procesos y es poco probable que choque con otros advisory locks de la base
+CHANGES_LOCK_KEY = zlib.crc32(b"media_changes")
+
+class MediaChange(db.Model):
+    """Registro de cambios (change feed) de media_files, incluye tombstones de borrado"""
+    __tablename__ = 'media_changes'
+    seq = db.Column(db.BigInteger().with_variant(db.Integer, "sqlite"), primary_key=True, autoincrement=True)
+    media_id = db.Column(db.String(36), nullable=False)
+    post_id = db.Column(db.String(50), nullable=False, index=True)
+    operation = db.Column(db.String(10), nullable=False)  # 'upsert' | 'delete'
+    filename = db.Column(db.String(255), nullable=True)
+    file_url = db.Column(db.String(500), nullable=True)
+    uploaded_at = db.Column(db.DateTime, nullable=True)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def to_dict(self):
+        deleted = self.operation == MEDIA_CHANGE_DELETE
+        return {
+            "token": str(self.seq),
+            "operation": self.operation,
+            "media_id": self.media_id,
+            "post_id": self.post_id,
+            "filename": None if deleted else self.filename,
+            "file_url": None if deleted else self.file_url,
+            "uploaded_at": self.uploaded_at.isoformat() if self.uploaded_at and not deleted else None,
+            "changed_at": self.changed_at.isoformat() if self.changed_at else None
+        }
+
+def lock_media_changes():
+    """Serializa las escrituras del change feed hasta el commit/rollback de la transacción.
+
+    El seq se asigna en el INSERT y no en el commit: sin este lock, una transacción
+    con seq 5 podría confirmar después de otra con seq 6 y un consumidor que ya
+    avanzó a next_token="6" perdería el 5. Con pg_advisory_xact_lock el orden de
+    seq coincide con el orden de commit. SQLite ya serializa las escrituras.
+    """
+    if db.session.get_bind().dialect.name == "postgresql":
+        db.session.execute(db.text("SELECT pg_advisory_xact_lock(:key)"), {"key": CHANGES_LOCK_KEY})
+
+def record_media_change(media, operation):
+    """Agrega una entrada al change feed en la sesión actual (se confirma con el mismo commit)"""
+    lock_media_changes()
+    if media.id is None:
+        # El default de la columna se aplica en el flush; lo fijamos antes para poder referenciarlo
+        media.id = str(uuid.uuid4())
+    if media.uploaded_at is None:
+        media.uploaded_at = datetime.utcnow()
+    change = MediaChange(
+        media_id=media.id,
+        post_id=media.post_id,
+        operation=operation,
+        filename=media.filename,
+        file_url=media.file_url,
+        uploaded_at=media.uploaded_at
+    )
+    db.session.add(change)
+    return change
+
+def backfill_media_changes():
+    """Agrega un upsert por cada media sin entradas en el change feed (idempotente)"""
+    lock_media_changes()
+    result = db.session.execute(db.text("""
+        INSERT INTO media_changes (media_id, post_id, operation, filename, file_url, uploaded_at, changed_at)
+        SELECT m.id, m.post_id, :operation, m.filename, m.file_url, m.uploaded_at,
+               COALESCE(m.uploaded_at, CURRENT_TIMESTAMP)
+        FROM media_files m
+        WHERE NOT EXISTS (SELECT 1 FROM media_changes c WHERE c.media_id = m.id)
+        ORDER BY m.uploaded_at, m.id
+    """), {"operation": MEDIA_CHANGE_UPSERT})
+    db.session.commit()
+    return result.rowcount
+
+def parse_change_token(token):
+    """Convierte el token de cursor en un número de secuencia (None/'' = desde el inicio)"""
+    if token in (None, ""):
+        return 0
+    try:
+        seq = int(token)
+    except (TypeError, ValueError):
+        raise ValueError("since must be a token returned by a previous changes call")
+    if seq < 0 or seq > CHANGES_MAX_TOKEN:
+        raise ValueError("since must be a token returned by a previous changes call")
+    return seq
+
+def get_media_changes(since=None, limit=CHANGES_DEFAULT_LIMIT):
+    """Obtiene los cambios posteriores al token dado, en orden de secuencia"""
+    since_seq = parse_change_token(since)
+    limit = max(1, min(int(limit), CHANGES_MAX_LIMIT))
+
+    # Pedimos uno extra para saber si quedan más páginas
+    rows = (MediaChange.query
+            .filter(MediaChange.seq > since_seq)
+            .order_by(MediaChange.seq.asc())
+            .limit(limit + 1)
+            .all())
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_token = str(rows[-1].seq) if rows else str(since_seq)
+
+    return rows, next_token, has_more
+
+# === COMPRESIÓN Y ETAGS ===
+def compress_level(low, high):
+    """COMPRESS_LEVEL ajustado al rango válido de cada codec"""
+    return max(low, min(Config.COMPRESS_LEVEL, high))
+
+# Orden de preferencia ante la misma calidad (q) en Accept-Encoding
+COMPRESSORS = {}
+if zstandard is not None:
+    COMPRESSORS["zstd"] = lambda data: zstandard.ZstdCompressor(level=compress_level(1, 22)).compress(data)
+if brotli is not None:
+    COMPRESSORS["br"] = lambda data: brotli.compress(data, quality=compress_level(0, 11))
+COMPRESSORS["gzip"] = lambda data: gzip.compress(data, compresslevel=compress_level(1, 9))
+
+def compute_etag(rows, *extra):
+    """ETag fuerte a partir de los id y uploaded_at de las filas (más datos extra de la petición)"""
+    digest = hashlib.sha256()
+    for row in sorted(rows, key=lambda r: r.id):
+        uploaded_at = row.uploaded_at.isoformat() if row.uploaded_at else ""
+        digest.update(f"{row.id}|{uploaded_at}\n".encode("utf-8"))
+    for value in extra:
+        digest.update(json.dumps(value, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+def etag_matches(etag):
+    """Compara con If-None-Match (comparación débil, como pide RFC 9110)"""
+    if_none_match = request.if_none_match
+    if not if_none_match:
+        return False
+    if request.method in ("GET", "HEAD"):
+        return if_none_match.contains_weak(etag)
+    # 304 en POST (batch, GraphQL) no es estándar: RFC 9110 pide 412. Lo mantenemos para el
+    # cliente del feed, pero solo con ETags concretos; "*" coincidiría con cualquier resultado
+    return if_none_match.is_strong(etag) or if_none_match.is_weak(etag)
+
+def not_modified_response(etag, weak=False):
+    """304 con el mismo validador y Vary que llevaría la respuesta 200"""
+    response = app.response_class(status=304)
+    response.set_etag(etag, weak=weak)
+    response.vary.add("Accept-Encoding")
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+def cached_json_response(payload, etag, status=200):
+    """Respuesta JSON con ETag; el 304 se resuelve en compress_and_validate_response"""
+    response = jsonify(payload)
+    response.status_code = status
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+def choose_encoding(data):
+    """Elige la mejor codificación disponible según Accept-Encoding (None si no conviene comprimir)"""
+    if len(data) < Config.COMPRESS_MIN_SIZE:
+        return None
+    best, best_quality = None, 0
+    for encoding in COMPRESSORS:
+        quality = request.accept_encodings.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+def is_graphql_query_request():
+    """True si la petición a /graphql es una operación query (no mutation/subscription)"""
+    from graphql import parse, OperationDefinitionNode, OperationType
+    from graphql.error import GraphQLError
+
+    if request.method == "GET":
+        params = request.args
+    else:
+        params = request.get_json(silent=True) or {}
+    query = params.get("query")
+    if not isinstance(query, str):
+        return False
+
+    try:
+        document = parse(query)
+    except GraphQLError:
+        return False
+
+    operations = [d for d in document.definitions if isinstance(d, OperationDefinitionNode)]
+    operation_name = params.get("operationName")
+    if operation_name:
+        operations = [op for op in operations if op.name and op.name.value == operation_name]
+    if len(operations) != 1:
+        return False
+    return operations[0].operation == OperationType.QUERY
+
+def graphql_has_errors(data):
+    """True si la respuesta GraphQL trae errores (no se deben validar con ETag)"""
+    try:
+        body = json.loads(data)
+    except ValueError:
+        return True
+    return not isinstance(body, dict) or bool(body.get("errors"))
+
+@app.after_request
+def compress_and_validate_response(response):
+    """ETag/304 y compresión de respuestas JSON según Accept-Encoding"""
+    if response.status_code != 200 or response.mimetype != "application/json":
+        return response
+    if response.direct_passthrough or "Content-Encoding" in response.headers:
+        return response
+
+    data = response.get_data()
+
+    # GraphQL no tiene filas a mano: el ETag de las queries sin errores se calcula sobre el cuerpo
+    if (request.path == "/graphql" and not response.get_etag()[0]
+            and is_graphql_query_request() and not graphql_has_errors(data)):
+        response.set_etag(hashlib.sha256(data).hexdigest())
+        response.headers["Cache-Control"] = "no-cache"
+
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding(data)
+
+    # Un ETag fuerte debe cambiar con la representación comprimida
+    etag, weak = response.get_etag()
+    if etag and encoding:
+        etag = f"{etag}-{encoding}"
+        response.set_etag(etag, weak=weak)
+
+    if etag and etag_matches(etag):
+        return not_modified_response(etag, weak=weak)
+
+    if encoding:
+        response.set_data(COMPRESSORS[encoding](data))
+        response.headers["Content-Encoding"] = encoding
+    return response
+
 # === MINIO CLIENT ===
 try:
     minio_client = Minio(
@@ -183,9 +433,11 @@ def upload_media_for_post():
             file_url=file_url
         )
         db.session.add(media)
+        record_media_change(media, MEDIA_CHANGE_UPSERT)
         db.session.commit()
         print(f"Media guardado en DB: {media.id} para post_id: {post_id}")
     except Exception as e:
+        db.session.rollback()
         if os.path.exists(temp_path):
             os.remove(temp_path)
         print(f"Error en DB: {e}")
@@ -206,7 +458,7 @@ def get_media_by_post_id(post_id):
     if not media_file:
         return jsonify({"error": "Media not found for this post_id"}), 404
 
-    return jsonify(media_file.to_dict()), 200
+    return cached_json_response(media_file.to_dict(), compute_etag([media_file]))
 
 @app.route("/api/media/batch", methods=["POST"])
 def get_batch_media():
@@ -225,8 +477,8 @@ def get_batch_media():
     print(f"Buscando {len(post_ids)} archivos")
 
     # Buscar todos los archivos en una sola consulta
-    media_files = MediaFile.query.filter(MediaFile.post_id.in_(post_ids)).all()
-    
+    media_files = MediaFile.query.filter(MediaFile.post_id.in_(post_ids)).order_by(MediaFile.id).all()
+
     results = []
     for media in media_files:
         results.append(media.to_dict())
@@ -235,12 +487,12 @@ def get_batch_media():
     found_post_ids = {media.post_id for media in media_files}
     not_found = [pid for pid in post_ids if pid not in found_post_ids]
 
-    return jsonify({
+    return cached_json_response({
         "found": results,
         "not_found": not_found,
         "total_requested": len(post_ids),
         "total_found": len(results)
-    }), 200
+    }, compute_etag(media_files, post_ids))  # not_found depende de los post_ids pedidos
 
 @app.route("/api/media/post/<post_id>", methods=["DELETE"])
 def delete_media_by_post_id(post_id):
@@ -259,7 +511,8 @@ def delete_media_by_post_id(post_id):
         except Exception as e:
             print(f"Error eliminando de MinIO: {e}")
 
-        # Eliminar de la base de datos
+        # Eliminar de la base de datos (con tombstone en el change feed)
+        record_media_change(media_file, MEDIA_CHANGE_DELETE)
         db.session.delete(media_file)
         db.session.commit()
         print(f"Media eliminado de DB para post_id: {post_id}")
@@ -271,6 +524,47 @@ def delete_media_by_post_id(post_id):
         print(f"Error eliminando archivo: {e}")
         return jsonify({"error": f"Internal server error: {str(e)}"}), 500
 
+@app.route("/api/media/changes", methods=["GET"])
+def get_changes_since():
+    """Obtener los cambios de media desde un token (incluye borrados)
+    ---
+    parameters:
+      - name: since
+        in: query
+        type: string
+        required: false
+        description: Token devuelto como next_token en la llamada anterior. Vacío = desde el inicio
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        default: 100
+    responses:
+      200:
+        description: Página de cambios ordenada y el token para la siguiente llamada
+      400:
+        description: Token o límite inválido
+    """
+    since = request.args.get('since')
+    limit = request.args.get('limit', CHANGES_DEFAULT_LIMIT)
+    print(f"GET /api/media/changes since={since} limit={limit}")
+
+    try:
+        limit = int(limit)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+
+    try:
+        changes, next_token, has_more = get_media_changes(since, limit)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify({
+        "changes": [change.to_dict() for change in changes],
+        "next_token": next_token,
+        "has_more": has_more
+    }), 200
+
 # Mantener endpoints legacy para compatibilidad
 @app.route("/api/media", methods=["POST"])
 def upload_file():
@@ -300,6 +594,7 @@ def delete_file(file_id):
 
     try:
         minio_client.remove_object(Config.MINIO_BUCKET, media_file.filename)
+        record_media_change(media_file, MEDIA_CHANGE_DELETE)
         db.session.delete(media_file)
         db.session.commit()
         return jsonify({"message": "File deleted successfully"}), 200
@@ -315,6 +610,15 @@ with app.app_context():
     except Exception as e:
         print(f"Error creando tablas: {e}")
 
+    # El servicio no corre migraciones al arrancar: los media previos al change feed se agregan aquí
+    try:
+        backfilled = backfill_media_changes()
+        if backfilled:
+            print(f"Change feed: {backfilled} media existentes agregados")
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error en backfill del change feed: {e}")
+
 # === GRAPHQL ===
 def setup_graphql():
     from strawberry.flask.views import GraphQLView
@@ -337,5 +641,6 @@ if __name__ == "__main__":
     print("  POST   /api/media/batch     - Obtener múltiples medias")
     print("  GET    /api/media/post/<id> - Obtener media por post_id")
     print("  DELETE /api/media/post/<id> - Eliminar media por post_id")
+    print("  GET    /api/media/changes   - Cambios desde un token")
     print("=" * 60)
     app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
@@ -10,6 +10,10 @@ class Config:
     MINIO_SECRET_KEY = os.getenv("MINIO_SECRET_KEY")
     MINIO_BUCKET = os.getenv("MINIO_BUCKET")
     MINIO_EXTERNAL_URL = os.getenv("MINIO_EXTERNAL_URL", "http://localhost:9000")
+    CHANGES_DEFAULT_LIMIT = 100
+    CHANGES_MAX_LIMIT = 1000
+    COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))  # bytes
+    COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", "6"))
 
     @staticmethod
     def validate():
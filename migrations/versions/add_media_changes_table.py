@@ -0,0 +1,45 @@
+"""Add media_changes table (change feed with tombstones)
+Revision ID: add_media_changes
+Revises: fix_media_structure
+Create Date: 2026-10-19 12:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'add_media_changes'
+down_revision = 'fix_media_structure'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # app.py crea la tabla con db.create_all() al arrancar; solo la creamos si no existe
+    if sa.inspect(op.get_bind()).has_table('media_changes'):
+        _backfill()
+        return
+
+    op.create_table('media_changes',
+        sa.Column('seq', sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column('media_id', sa.String(36), nullable=False),
+        sa.Column('post_id', sa.String(50), nullable=False),
+        sa.Column('operation', sa.String(10), nullable=False),
+        sa.Column('filename', sa.String(255), nullable=True),
+        sa.Column('file_url', sa.String(500), nullable=True),
+        sa.Column('uploaded_at', sa.DateTime(), nullable=True),
+        sa.Column('changed_at', sa.DateTime(), nullable=False)
+    )
+    op.create_index('ix_media_changes_post_id', 'media_changes', ['post_id'])
+    _backfill()
+
+def _backfill():
+    # Un upsert por cada media sin entradas, para que since="" sea una foto completa
+    op.execute("""
+        INSERT INTO media_changes (media_id, post_id, operation, filename, file_url, uploaded_at, changed_at)
+        SELECT m.id, m.post_id, 'upsert', m.filename, m.file_url, m.uploaded_at, COALESCE(m.uploaded_at, NOW())
+        FROM media_files m
+        WHERE NOT EXISTS (SELECT 1 FROM media_changes c WHERE c.media_id = m.id)
+        ORDER BY m.uploaded_at NULLS FIRST, m.id
+    """)
+
+def downgrade():
+    op.drop_index('ix_media_changes_post_id', table_name='media_changes')
+    op.drop_table('media_changes')
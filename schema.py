@@ -1,6 +1,7 @@
 # schema.py
 import strawberry
 from typing import List, Optional
+from config import Config
 
 @strawberry.type
 class MediaType:
@@ -30,6 +31,23 @@ class BatchPresignedResponse:
     total_requested: int
     total_found: int
 
+@strawberry.type
+class MediaChangeType:
+    token: str
+    operation: str
+    media_id: str
+    post_id: str
+    filename: Optional[str]
+    file_url: Optional[str]
+    uploaded_at: Optional[str]
+    changed_at: Optional[str]
+
+@strawberry.type
+class MediaChangesPage:
+    changes: List[MediaChangeType]
+    next_token: str
+    has_more: bool
+
 @strawberry.type
 class Query:
     @strawberry.field
@@ -69,6 +87,17 @@ class Query:
             )
         return None
 
+    @strawberry.field
+    def media_changes(self, since: Optional[str] = None, limit: int = Config.CHANGES_DEFAULT_LIMIT) -> MediaChangesPage:
+        from app import get_media_changes
+        
+        changes, next_token, has_more = get_media_changes(since, limit)
+        return MediaChangesPage(
+            changes=[MediaChangeType(**change.to_dict()) for change in changes],
+            next_token=next_token,
+            has_more=has_more
+        )
+
 @strawberry.type
 class Mutation:
     @strawberry.mutation
@@ -0,0 +1,47 @@
+import io
+import os
+import sys
+import tempfile
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# La config se lee al importar app: SQLite temporal y MinIO simulado
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ["MINIO_ENDPOINT"] = "minio.test:9000"
+os.environ["MINIO_ACCESS_KEY"] = "test"
+os.environ["MINIO_SECRET_KEY"] = "test"
+os.environ["MINIO_BUCKET"] = "test-bucket"
+os.environ["MINIO_EXTERNAL_URL"] = "http://minio.test:9000"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+with patch("minio.Minio", return_value=MagicMock()):
+    import app as media_app
+
+
+@pytest.fixture
+def client():
+    media_app.app.config["TESTING"] = True
+    with media_app.app.app_context():
+        media_app.db.drop_all()
+        media_app.db.create_all()
+    media_app.minio_client.reset_mock()
+    with media_app.app.test_client() as client:
+        yield client
+    with media_app.app.app_context():
+        media_app.db.session.remove()
+
+
+@pytest.fixture
+def upload(client):
+    def _upload(post_id, content=b"data", filename="image.png"):
+        response = client.post(
+            "/api/media/upload",
+            data={"post_id": post_id, "file": (io.BytesIO(content), filename)},
+            content_type="multipart/form-data",
+        )
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()
+    return _upload
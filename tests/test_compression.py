@@ -0,0 +1,168 @@
+import gzip
+
+import pytest
+
+import app as media_app
+
+
+@pytest.fixture
+def min_size(monkeypatch):
+    def _set(size):
+        monkeypatch.setattr(media_app.Config, "COMPRESS_MIN_SIZE", size)
+    return _set
+
+
+def batch(client, post_ids, **headers):
+    return client.post("/api/media/batch", json={"post_ids": post_ids}, headers=headers)
+
+
+def test_small_response_is_not_compressed(client, upload, min_size):
+    min_size(10_000)
+    upload("post-1")
+
+    response = batch(client, ["post-1"], **{"Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert "Content-Encoding" not in response.headers
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert not response.headers["ETag"].endswith('-gzip"')
+
+
+def test_large_response_is_gzipped(client, upload, min_size):
+    min_size(10)
+    upload("post-1")
+
+    response = batch(client, ["post-1"], **{"Accept-Encoding": "gzip"})
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["ETag"].endswith('-gzip"')
+    body = gzip.decompress(response.data)
+    assert b"post-1" in body
+
+
+@pytest.mark.parametrize("encoding, module", [("br", "brotli"), ("zstd", "zstandard")])
+def test_brotli_and_zstd_negotiation(client, upload, min_size, encoding, module):
+    codec = pytest.importorskip(module)
+    decompress = codec.decompress if module == "brotli" else codec.ZstdDecompressor().decompress
+    min_size(10)
+    upload("post-1")
+
+    response = batch(client, ["post-1"], **{"Accept-Encoding": f"gzip;q=0.5, {encoding}"})
+
+    assert response.headers["Content-Encoding"] == encoding
+    assert b"post-1" in decompress(response.data)
+
+
+def test_no_compression_without_accept_encoding(client, upload, min_size):
+    min_size(10)
+    upload("post-1")
+
+    response = batch(client, ["post-1"])
+
+    assert "Content-Encoding" not in response.headers
+
+
+def test_batch_304_round_trip_keeps_validator_and_vary(client, upload, min_size):
+    min_size(10)
+    upload("post-1")
+    headers = {"Accept-Encoding": "gzip"}
+
+    first = batch(client, ["post-1", "post-2"], **headers)
+    etag = first.headers["ETag"]
+
+    second = batch(client, ["post-1", "post-2"], **headers, **{"If-None-Match": etag})
+
+    assert second.status_code == 304
+    assert second.data == b""
+    assert second.headers["ETag"] == etag
+    assert "Accept-Encoding" in second.headers["Vary"]
+
+
+def test_validator_of_other_encoding_does_not_match(client, upload, min_size):
+    min_size(10)
+    upload("post-1")
+    gzip_etag = batch(client, ["post-1"], **{"Accept-Encoding": "gzip"}).headers["ETag"]
+
+    response = batch(client, ["post-1"], **{"If-None-Match": gzip_etag})
+
+    assert response.status_code == 200
+
+
+def test_batch_etag_changes_with_rows_and_request(client, upload):
+    upload("post-1")
+    etag = batch(client, ["post-1", "post-2"]).headers["ETag"]
+
+    assert batch(client, ["post-1"]).headers["ETag"] != etag
+
+    upload("post-2")
+    response = batch(client, ["post-1", "post-2"], **{"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_get_by_post_id_304(client, upload):
+    upload("post-1")
+    etag = client.get("/api/media/post/post-1").headers["ETag"]
+
+    response = client.get("/api/media/post/post-1", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+
+def test_graphql_query_304(client, upload):
+    upload("post-1")
+    payload = {"query": "{ mediaChanges { nextToken } }"}
+    etag = client.post("/graphql", json=payload).headers["ETag"]
+
+    response = client.post("/graphql", json=payload, headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+
+
+def test_graphql_mutation_has_no_etag(client):
+    payload = {
+        "query": "mutation { generateBatchPresignedUrls(input: {postIds: []}) { totalFound } }"
+    }
+
+    response = client.post("/graphql", json=payload, headers={"If-None-Match": "*"})
+
+    assert response.status_code == 200
+    assert "ETag" not in response.headers
+
+
+def test_graphql_error_response_has_no_etag(client):
+    payload = {"query": "{ mediaChanges(since: \"abc\") { nextToken } }"}
+
+    response = client.post("/graphql", json=payload, headers={"If-None-Match": "*"})
+
+    assert response.status_code == 200
+    assert response.get_json()["errors"]
+    assert "ETag" not in response.headers
+
+
+@pytest.mark.parametrize("level", [-5, 0, 15, 30])
+def test_out_of_range_level_is_clamped(client, upload, min_size, monkeypatch, level):
+    min_size(10)
+    monkeypatch.setattr(media_app.Config, "COMPRESS_LEVEL", level)
+    upload("post-1")
+
+    response = batch(client, ["post-1"], **{"Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert b"post-1" in gzip.decompress(response.data)
+
+
+def test_star_if_none_match_is_ignored_on_post(client):
+    response = batch(client, ["x"], **{"If-None-Match": "*"})
+
+    assert response.status_code == 200
+    assert response.get_json()["not_found"] == ["x"]
+
+
+def test_star_if_none_match_on_get(client, upload):
+    upload("post-1")
+
+    response = client.get("/api/media/post/post-1", headers={"If-None-Match": "*"})
+
+    assert response.status_code == 304
@@ -0,0 +1,110 @@
+import app as media_app
+
+
+def get_changes(client, **params):
+    response = client.get("/api/media/changes", query_string=params)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_upload_records_upsert(client, upload):
+    media = upload("post-1")
+
+    page = get_changes(client)
+
+    assert [c["operation"] for c in page["changes"]] == ["upsert"]
+    change = page["changes"][0]
+    assert change["media_id"] == media["id"]
+    assert change["post_id"] == "post-1"
+    assert change["file_url"] == media["file_url"]
+    assert page["next_token"] == change["token"]
+    assert page["has_more"] is False
+
+
+def test_delete_records_tombstone(client, upload):
+    media = upload("post-1")
+    first = get_changes(client)
+
+    response = client.delete("/api/media/post/post-1")
+    assert response.status_code == 200
+
+    page = get_changes(client, since=first["next_token"])
+    assert len(page["changes"]) == 1
+    tombstone = page["changes"][0]
+    assert tombstone["operation"] == "delete"
+    assert tombstone["media_id"] == media["id"]
+    assert tombstone["post_id"] == "post-1"
+    assert tombstone["file_url"] is None
+
+
+def test_legacy_delete_records_tombstone(client, upload):
+    media = upload("post-1")
+
+    response = client.delete(f"/api/media/{media['id']}")
+    assert response.status_code == 200
+
+    operations = [c["operation"] for c in get_changes(client)["changes"]]
+    assert operations == ["upsert", "delete"]
+
+
+def test_paging_with_next_token(client, upload):
+    for i in range(5):
+        upload(f"post-{i}")
+
+    first = get_changes(client, limit=2)
+    assert [c["post_id"] for c in first["changes"]] == ["post-0", "post-1"]
+    assert first["has_more"] is True
+
+    second = get_changes(client, since=first["next_token"], limit=2)
+    assert [c["post_id"] for c in second["changes"]] == ["post-2", "post-3"]
+    assert second["has_more"] is True
+
+    last = get_changes(client, since=second["next_token"], limit=2)
+    assert [c["post_id"] for c in last["changes"]] == ["post-4"]
+    assert last["has_more"] is False
+
+    # Sin cambios nuevos el token no avanza
+    empty = get_changes(client, since=last["next_token"])
+    assert empty["changes"] == []
+    assert empty["next_token"] == last["next_token"]
+
+
+def test_invalid_since_returns_400(client):
+    for since in ("abc", "-1", "99999999999999999999"):
+        response = client.get("/api/media/changes", query_string={"since": since})
+        assert response.status_code == 400
+        assert "error" in response.get_json()
+
+
+def test_invalid_limit_returns_400(client):
+    response = client.get("/api/media/changes", query_string={"limit": "many"})
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+
+
+def test_graphql_media_changes(client, upload):
+    upload("post-1")
+    client.delete("/api/media/post/post-1")
+
+    response = client.post("/graphql", json={
+        "query": "{ mediaChanges(since: \"\", limit: 10) { changes { operation postId } nextToken hasMore } }"
+    })
+
+    assert response.status_code == 200
+    data = response.get_json()["data"]["mediaChanges"]
+    assert [c["operation"] for c in data["changes"]] == ["upsert", "delete"]
+    assert data["hasMore"] is False
+
+
+def test_backfill_adds_existing_media_once(client):
+    with media_app.app.app_context():
+        media_app.db.session.add(media_app.MediaFile(
+            post_id="legacy-post", filename="legacy.png", file_url="http://minio.test:9000/legacy.png"
+        ))
+        media_app.db.session.commit()
+
+        assert media_app.backfill_media_changes() == 1
+        assert media_app.backfill_media_changes() == 0
+
+    changes = get_changes(client)["changes"]
+    assert [(c["operation"], c["post_id"]) for c in changes] == [("upsert", "legacy-post")]